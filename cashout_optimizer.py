@@ -1,15 +1,21 @@
-import pandas as pd
-import numpy as np
 import datetime as dt
+from math import ceil
+from os import makedirs, path
+from typing import TYPE_CHECKING, Tuple
 
-from dateutil.relativedelta import relativedelta
-from matplotlib import pyplot as plt
-from pandas import option_context
+from library.modules.misc import parameter_grid
 
-from sklearn.model_selection import ParameterGrid
+if TYPE_CHECKING:
+    import pandas as pd
+    from dateutil.relativedelta import relativedelta
 
+DEPENDENCIES = ('pandas', 'matplotlib.pyplot', 'dateutil.relativedelta')
 
-def calculate_cashout(df: pd.DataFrame, daily_earnings: float, minimum_cashout: int, max_holdout: relativedelta,
+CASHOUT_COLORS = {'loses_cashout_dates': 'red',
+                  'profits_cashout_dates': 'green'}
+
+
+def calculate_cashout(df: 'pd.DataFrame', daily_earnings: float, minimum_cashout: int, max_holdout: 'relativedelta',
                       upper_cashout_boundary: float, lower_cashout_boundary: float):
     total_cashout = 0
     earnings = 0
@@ -46,7 +52,15 @@ def calculate_cashout(df: pd.DataFrame, daily_earnings: float, minimum_cashout:
     return total_cashout, profits_cashout_dates, loses_cashout_dates
 
 
-def optimize_parameters(df: pd.DataFrame, initial_date: int, parameters: dict):
+def optimize_parameters(df: 'pd.DataFrame', initial_date: int, parameters: dict, report_dir: str = None,
+                        top_n: int = 10, max_points: int = 2000, n_processes: int = 1):
+    """
+    Simulate every combination of <parameters> and return the best one.
+    If <report_dir> is given the <top_n> strategies are rendered headlessly into it instead of shown on screen.
+    """
+    import pandas as pd
+    from pandas import option_context
+
     initial_date = dt.datetime.strptime(str(initial_date), "%Y%m%d").date()
     df = df[df.date.dt.date >= initial_date]
     df.set_index('date', inplace=True)
@@ -54,7 +68,7 @@ def optimize_parameters(df: pd.DataFrame, initial_date: int, parameters: dict):
 
     simulation_results = pd.DataFrame()
     # i = 0
-    for iteration_arguments in ParameterGrid(parameters):
+    for iteration_arguments in parameter_grid(parameters):
         # i += 1
         # print(f'Starting iteration {i}')
         total_cashout, profits_cashout_dates, loses_cashout_dates = calculate_cashout(df, **iteration_arguments)
@@ -75,32 +89,181 @@ def optimize_parameters(df: pd.DataFrame, initial_date: int, parameters: dict):
         print(simulation_results)
 
     best_results = simulation_results.iloc[0]
-    plot_simulation_results(df, best_results)
+    if report_dir is None:
+        plot_simulation_results(df, best_results)
+    else:
+        write_report(df, simulation_results, report_dir, top_n=top_n, max_points=max_points, n_processes=n_processes)
 
     return best_results
 
 
-def plot_simulation_results(df: pd.DataFrame, best_results: pd.Series):
-    plt.plot(df.index, df.value)
-    for date in best_results['loses_cashout_dates']:
-        plt.axvline(x=date, color='red')
-    for date in best_results['profits_cashout_dates']:
-        plt.axvline(x=date, color='green')
+def draw_simulation_results(ax, df: 'pd.DataFrame', results: 'pd.Series'):
+    """
+    Draw the price series and the cashout dates of <results> on <ax>.
+    Each cashout category is drawn as a single LineCollection spanning the whole axis height instead of one axvline
+    artist per date, which keeps drawing time flat for strategies with hundreds of cashouts. Like axvline, the markers
+    don't take part in autoscaling, so the y axis still fits the price series.
+    >>> import pandas as pd
+    >>> from matplotlib.figure import Figure
+    >>> df = pd.DataFrame({'value': [100., 110., 105.]}, index=pd.date_range('2021-01-01', periods=3))
+    >>> results = pd.Series({'profits_cashout_dates': list(df.index[1:]), 'loses_cashout_dates': []})
+    >>> ax = Figure().add_subplot()
+    >>> draw_simulation_results(ax, df, results)
+    >>> len(ax.collections), ax.get_ylim()[0] > 90
+    (1, True)
+    """
+    from matplotlib.collections import LineCollection
+    from matplotlib.dates import date2num
+
+    ax.plot(df.index, df.value, zorder=3)
+    for category, color in CASHOUT_COLORS.items():
+        if len(results[category]) > 0:
+            segments = [[(x, 0), (x, 1)] for x in date2num(results[category])]
+            ax.add_collection(LineCollection(segments, colors=color, transform=ax.get_xaxis_transform()),
+                              autolim=False)
+
+
+def plot_simulation_results(df: 'pd.DataFrame', best_results: 'pd.Series'):
+    from matplotlib import pyplot as plt
+
+    fig, ax = plt.subplots()
+    draw_simulation_results(ax, df, best_results)
     plt.show()
 
 
-df = pd.read_csv('data/bitcoin_value.csv', parse_dates=[1])
-df = df[['Date', '24h Low (USD)']]
-df.columns = ['date', 'value']
-# df['date'] = pd.to_datetime(df.date, infer_datetime_format=True).dt.date
+def downsample(df: 'pd.DataFrame', max_points: int) -> 'pd.DataFrame':
+    """
+    Reduce the price series to at most <max_points> rows for display, keeping the minimum and maximum of each bucket
+    of consecutive dates so that peaks and drops are still visible.
+    >>> import pandas as pd
+    >>> df = pd.DataFrame({'value': [float(i % 7) for i in range(100)]})
+    >>> df.loc[37, 'value'], df.loc[64, 'value'] = -1., 50.
+    >>> sampled = downsample(df, 9)
+    >>> len(sampled) <= 9, sampled.value.min(), sampled.value.max()
+    (True, -1.0, 50.0)
+    >>> sampled.index.is_monotonic_increasing
+    True
+    >>> len(downsample(df, 100))
+    100
+    """
+    assert max_points >= 2, f'max_points must be at least 2 to keep both minimum and maximum, got {max_points}'
+    if len(df) <= max_points:
+        return df
+    bucket_size = ceil(len(df) / (max_points // 2))
+    values = df.value.to_numpy()
+    positions = set()
+    for start in range(0, len(df), bucket_size):
+        bucket = values[start:start + bucket_size]
+        positions.update([start + int(bucket.argmin()), start + int(bucket.argmax())])
+    return df.iloc[sorted(positions)]
+
+
+def render_report(df: 'pd.DataFrame', results: 'pd.Series', output_path: str,
+                  formats: Tuple[str, ...] = ('png', 'svg')) -> list:
+    """
+    Render the simulation of a single strategy without a display and save it as <output_path>.<format>.
+    Uses the Agg canvas directly instead of pyplot, so no global figure state is kept and it is safe to call from
+    worker processes.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(16, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    draw_simulation_results(ax, df, results)
+    ax.set_title(f"total cashout {results['total_cashout']:.2f} | "
+                 f"upper boundary {results['upper_cashout_boundary']} | "
+                 f"lower boundary {results['lower_cashout_boundary']}")
+    files = []
+    for format_ in formats:
+        files.append(f'{output_path}.{format_}')
+        fig.savefig(files[-1], format=format_, bbox_inches='tight')
+    return files
+
+
+def write_report(df: 'pd.DataFrame', simulation_results: 'pd.DataFrame', output_dir: str, top_n: int = 10,
+                 max_points: int = 2000, n_processes: int = 1, formats: Tuple[str, ...] = ('png', 'svg')) -> list:
+    """
+    Write a csv with the <top_n> simulation results and one plot per strategy into <output_dir>.
+    The price series is downsampled once for display and the plots are rendered on <n_processes> processes.
+    :return: Paths of the written files.
+    >>> import os
+    >>> import tempfile
+    >>> import pandas as pd
+    >>> from dateutil.relativedelta import relativedelta
+    >>> df = pd.DataFrame({'value': [float(i % 11) for i in range(60)]}, index=pd.date_range('2021-01-01', periods=60))
+    >>> simulation_results = pd.DataFrame({'upper_cashout_boundary': [0.1, 0.2, 0.3],
+    ...                                    'lower_cashout_boundary': [0.05, 0.05, 0.1],
+    ...                                    'max_holdout': [relativedelta(months=3)] * 3,
+    ...                                    'total_cashout': [3., 2., 1.],
+    ...                                    'profits_cashout_dates': [list(df.index[[5, 20]]), [], [df.index[9]]],
+    ...                                    'loses_cashout_dates': [[df.index[30]], list(df.index[[1, 2]]), []]})
+    >>> for n_processes in (1, 2):
+    ...     with tempfile.TemporaryDirectory() as output_dir:
+    ...         files = write_report(df, simulation_results, output_dir, top_n=2, max_points=20,
+    ...                              n_processes=n_processes)
+    ...         print(sorted(path.basename(file) for file in files))
+    ...         print(sorted(os.listdir(output_dir)) == sorted(path.basename(file) for file in files))
+    ...         print(open(path.join(output_dir, 'top_results.csv')).read())
+    ['strategy_000.png', 'strategy_000.svg', 'strategy_001.png', 'strategy_001.svg', 'top_results.csv']
+    True
+    rank,upper_cashout_boundary,lower_cashout_boundary,max_holdout,total_cashout,profits_cashout_dates,loses_cashout_dates
+    0,0.1,0.05,relativedelta(months=+3),3.0,2021-01-06 2021-01-21,2021-01-31
+    1,0.2,0.05,relativedelta(months=+3),2.0,,2021-01-02 2021-01-03
+    <BLANKLINE>
+    ['strategy_000.png', 'strategy_000.svg', 'strategy_001.png', 'strategy_001.svg', 'top_results.csv']
+    True
+    rank,upper_cashout_boundary,lower_cashout_boundary,max_holdout,total_cashout,profits_cashout_dates,loses_cashout_dates
+    0,0.1,0.05,relativedelta(months=+3),3.0,2021-01-06 2021-01-21,2021-01-31
+    1,0.2,0.05,relativedelta(months=+3),2.0,,2021-01-02 2021-01-03
+    <BLANKLINE>
+    """
+    makedirs(output_dir, exist_ok=True)
+    top_results = simulation_results.head(top_n).reset_index(drop=True)
+
+    csv_path = path.join(output_dir, 'top_results.csv')
+    top_results.assign(**{category: top_results[category].map(lambda dates: ' '.join(str(d.date()) for d in dates))
+                          for category in CASHOUT_COLORS},
+                       max_holdout=top_results.max_holdout.map(str)) \
+        .to_csv(csv_path, index_label='rank')
+
+    df = downsample(df, max_points)
+    output_paths = [path.join(output_dir, f'strategy_{rank:03d}') for rank in top_results.index]
+    tasks = [(df, results, output_path, formats)
+             for (_, results), output_path in zip(top_results.iterrows(), output_paths)]
+    if n_processes > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=n_processes) as executor:
+            files = list(executor.map(render_report, *zip(*tasks)))
+    else:
+        files = [render_report(*task) for task in tasks]
+    return [csv_path] + [file for task_files in files for file in task_files]
+
+
+def main(data_path: str = 'data/bitcoin_value.csv', initial_date: int = 20160101, report_dir: str = None,
+         top_n: int = 10, max_points: int = 2000, n_processes: int = 1):
+    import pandas as pd
+    from dateutil.relativedelta import relativedelta
+
+    df = pd.read_csv(data_path, parse_dates=[1])
+    df = df[['Date', '24h Low (USD)']]
+    df.columns = ['date', 'value']
+    # df['date'] = pd.to_datetime(df.date, infer_datetime_format=True).dt.date
+
+    parameters = {'daily_earnings': [50.0],
+                  'minimum_cashout': [300],
+                  'max_holdout': [relativedelta(months=3)],
+                  'upper_cashout_boundary': [i / 100 for i in range(51)],
+                  'lower_cashout_boundary': [i / 100 for i in range(51)]}
+
+    best_results = optimize_parameters(df, initial_date, parameters, report_dir=report_dir, top_n=top_n,
+                                       max_points=max_points, n_processes=n_processes)
+    print([str(date) for date in best_results['profits_cashout_dates']])
 
-parameters = {'daily_earnings': [50.0],
-              'minimum_cashout': [300],
-              'max_holdout': [relativedelta(months=3)],
-              'upper_cashout_boundary': np.arange(0, 51, 1) / 100,
-              'lower_cashout_boundary': np.arange(0, 51, 1) / 100}
+    print('The end')
 
-best_results = optimize_parameters(df, 20160101, parameters)
-print([str(date) for date in best_results['profits_cashout_dates']])
 
-print('The end')
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""
+Single entry point for the mining tools.
+Subcommand modules are imported only once the subcommand is chosen, and each of them imports its heavy dependencies
+only on the code paths that use them, so cron runs of fan-tune and oc-autotune don't pay for pandas or matplotlib.
+Each subcommand module lists those lazily imported modules in a DEPENDENCIES tuple, which the importtime subcommand
+adds to the measured imports so that it reports the real startup cost of running the subcommand.
+
+Usage:
+    python cli.py fan-tune [--config data/config.yaml]
+    python cli.py oc-autotune [--config data/config.yaml]
+    python cli.py cashout-optimize [--data data/bitcoin_value.csv] [--initial-date 20160101] [--report-dir DIR]
+                                   [--top-n 10] [--max-points 2000] [--processes 1]
+    python cli.py simulate [--farms 1] [--workers 1] [--gpus 8] [--config-out FILE] [--cycles N --controller fan_tune]
+    python cli.py importtime [--history data/importtime.csv]
+"""
+import argparse
+import importlib
+import subprocess
+
+SUBCOMMAND_MODULES = {'fan-tune': 'fan_tune',
+                      'oc-autotune': 'oc_autotune',
+                      'cashout-optimize': 'cashout_optimizer',
+                      'simulate': 'library.modules.hiveos_simulator'}
+
+REPORT_DEFAULTS = {'top_n': 10,
+                   'max_points': 2000,
+                   'processes': 1}
+
+
+def fan_tune(args: argparse.Namespace):
+    importlib.import_module('fan_tune').main(config_path=args.config)
+
+
+def oc_autotune(args: argparse.Namespace):
+    importlib.import_module('oc_autotune').main(config_path=args.config)
+
+
+def cashout_optimize(args: argparse.Namespace):
+    importlib.import_module('cashout_optimizer').main(data_path=args.data, initial_date=args.initial_date,
+                                                      report_dir=args.report_dir, top_n=args.top_n,
+                                                      max_points=args.max_points, n_processes=args.processes)
+
+
+def simulate(args: argparse.Namespace):
+    importlib.import_module('library.modules.hiveos_simulator').main(
+        host=args.host, port=args.port, n_farms=args.farms, n_workers=args.workers, n_gpus=args.gpus,
+        first_farm_id=args.first_farm_id, latency=tuple(args.latency), rate_limit_probability=args.rate_limit,
+        failure_probability=args.failure, seed=args.seed, base_config_path=args.base_config,
+        config_out=args.config_out, cycles=args.cycles, controller=args.controller)
+
+
+def importtime(args: argparse.Namespace):
+    from library.modules.profiling import track_import_time
+
+    for subcommand in args.subcommands or SUBCOMMAND_MODULES.keys():
+        module_name = SUBCOMMAND_MODULES[subcommand]
+        # A missing dependency only skips its subcommand, the rest are still measured
+        try:
+            module = importlib.import_module(module_name)
+            modules = ['cli', module_name] + list(getattr(module, 'DEPENDENCIES', ()))
+            track_import_time(subcommand, modules, history_path=args.history)
+        except ImportError as e:
+            print(f'{subcommand}: failed, {e!r}')
+        except subprocess.CalledProcessError as e:
+            print(f'{subcommand}: failed, ' + ' | '.join(e.stderr.strip().splitlines()[-3:]))
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Mining farm tools.')
+    subparsers = parser.add_subparsers(dest='subcommand', required=True)
+
+    parser_fan_tune = subparsers.add_parser('fan-tune', help='Adjust power limits to keep fans under their limits.')
+    parser_fan_tune.add_argument('--config', default='data/config.yaml')
+    parser_fan_tune.set_defaults(func=fan_tune)
+
+    parser_oc_autotune = subparsers.add_parser('oc-autotune', help='Collect gpu metrics for overclock autotuning.')
+    parser_oc_autotune.add_argument('--config', default='data/config.yaml')
+    parser_oc_autotune.set_defaults(func=oc_autotune)
+
+    parser_cashout = subparsers.add_parser('cashout-optimize', help='Search the best cashout strategy parameters.')
+    parser_cashout.add_argument('--data', default='data/bitcoin_value.csv')
+    parser_cashout.add_argument('--initial-date', type=int, default=20160101, help='Format YYYYMMDD.')
+    parser_cashout.add_argument('--report-dir', default=None,
+                                help='Write plots and a csv of the best results here instead of showing a plot.')
+    # Report options default to None so that passing them without --report-dir can be detected
+    parser_cashout.add_argument('--top-n', type=int, default=None,
+                                help=f'Number of best strategies to report. Default {REPORT_DEFAULTS["top_n"]}.')
+    parser_cashout.add_argument('--max-points', type=int, default=None,
+                                help=f'Maximum number of price points drawn per report plot, at least 2. '
+                                     f'Default {REPORT_DEFAULTS["max_points"]}.')
+    parser_cashout.add_argument('--processes', type=int, default=None,
+                                help=f'Processes used to render the report plots. '
+                                     f'Default {REPORT_DEFAULTS["processes"]}.')
+    parser_cashout.set_defaults(func=cashout_optimize)
+
+    parser_simulate = subparsers.add_parser('simulate',
+                                            help='Serve a local HiveOS API simulator for load-testing the tools.')
+    parser_simulate.add_argument('--host', default='127.0.0.1')
+    parser_simulate.add_argument('--port', type=int, default=8080)
+    parser_simulate.add_argument('--farms', type=int, default=1)
+    parser_simulate.add_argument('--workers', type=int, default=1, help='Workers per farm.')
+    parser_simulate.add_argument('--gpus', type=int, default=8, help='GPUs per worker.')
+    parser_simulate.add_argument('--first-farm-id', type=int, default=600000)
+    parser_simulate.add_argument('--latency', type=float, nargs=2, default=[0., 0.], metavar=('MIN', 'MAX'),
+                                 help='Seconds of latency added to every request, drawn uniformly.')
+    parser_simulate.add_argument('--rate-limit', type=float, default=0., help='Probability of answering a 429.')
+    parser_simulate.add_argument('--failure', type=float, default=0., help='Probability of answering a 500.')
+    parser_simulate.add_argument('--seed', type=int, default=0)
+    parser_simulate.add_argument('--base-config', default='data/config.yaml')
+    parser_simulate.add_argument('--config-out', default=None,
+                                 help='Write a config file pointing to the simulator and listing the simulated farms.')
+    parser_simulate.add_argument('--cycles', type=int, default=0,
+                                 help='Run --controller this many times against the simulator, report each cycle '
+                                      'and exit.')
+    parser_simulate.add_argument('--controller', default='fan_tune',
+                                 help='Module whose main(config_path) is run on each cycle. Requires --config-out.')
+    parser_simulate.set_defaults(func=simulate)
+
+    parser_importtime = subparsers.add_parser('importtime',
+                                              help='Measure the `python -X importtime` cost of each subcommand.')
+    parser_importtime.add_argument('subcommands', nargs='*',
+                                   help=f'Any of {", ".join(SUBCOMMAND_MODULES.keys())}. Defaults to all of them.')
+    parser_importtime.add_argument('--history', default='data/importtime.csv',
+                                   help='Csv file the measurements are appended to.')
+    parser_importtime.set_defaults(func=importtime)
+
+    args = parser.parse_args(argv)
+    unknown_subcommands = [s for s in getattr(args, 'subcommands', []) if s not in SUBCOMMAND_MODULES]
+    if unknown_subcommands:
+        parser.error(f'unknown subcommands: {", ".join(unknown_subcommands)}')
+    if args.subcommand == 'cashout-optimize':
+        report_options = [f'--{k.replace("_", "-")}' for k in REPORT_DEFAULTS if getattr(args, k) is not None]
+        if args.report_dir is None and report_options:
+            parser.error(f'{", ".join(report_options)} can only be used with --report-dir')
+        for k, default in REPORT_DEFAULTS.items():
+            if getattr(args, k) is None:
+                setattr(args, k, default)
+        if args.max_points < 2:
+            parser.error('--max-points must be at least 2')
+        if args.top_n < 1 or args.processes < 1:
+            parser.error('--top-n and --processes must be at least 1')
+    if args.subcommand == 'simulate' and args.cycles and not args.config_out:
+        parser.error('--cycles requires --config-out')
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    args.func(args)
@@ -13,6 +13,7 @@ class HiveOSApi:
         # self.username = config.username
         # self.password = config.password
         self.headers = config.headers
+        self.baseUrl = config.get('base_url', self.baseUrl)
 
         # account = self.get_account()
         # auth = self.login()
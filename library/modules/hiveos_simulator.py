@@ -0,0 +1,460 @@
+import importlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, Tuple
+
+import yaml
+
+from library.modules.config import load_yaml
+
+# Reference figures per model: (nominal power W, min power W, max power W, hash kH/s at nominal power)
+GPU_MODELS = {'RTX 3070': (130, 100, 220, 61000),
+              'RTX 3080': (310, 200, 370, 98000),
+              'RTX 3090': (320, 250, 400, 122000)}
+
+
+class SimulatedGpu:
+    """
+    A single GPU whose fan speed, power draw and hashrate respond to the applied power limit.
+    Power draw settles on the power limit with unbiased ±1% noise; the fan follows the sustained power, i.e. the power
+    limit, with a per-card thermal slope, so lowering the power limit brings the fan down the way a real card does
+    under a constant load.
+    Thermal slopes are drawn so that every card can get under the configured fan limits above its minimum power.
+    """
+
+    def __init__(self, index: int, bus_number: int, short_name: str, rng: random.Random):
+        self.index = index
+        self.bus_number = bus_number
+        self.short_name = short_name
+        self.rng = rng
+        nominal_power, self.min_power, self.max_power, self.nominal_hash = GPU_MODELS[short_name]
+        self.nominal_power = nominal_power
+        self.power_limit = nominal_power
+        self.core_clock = rng.choice([-200, -100, 0, 100])
+        self.mem_clock = rng.choice([1000, 1100, 1200])
+        # Fan % at nominal power and fan % per watt vary per card to mimic airflow differences within a rig
+        self.fan_at_nominal = rng.uniform(60, 80)
+        self.fan_per_watt = rng.uniform(0.3, 0.5)
+
+    def set_power_limit(self, power_limit: int):
+        self.power_limit = max(self.min_power, min(self.max_power, int(power_limit)))
+
+    @property
+    def power(self) -> int:
+        return int(round(self.power_limit * self.rng.uniform(0.99, 1.01)))
+
+    def fan(self) -> int:
+        fan = (self.fan_at_nominal + (self.power_limit - self.nominal_power) * self.fan_per_watt
+               + self.rng.uniform(-0.5, 0.5))
+        return int(round(max(30, min(100, fan))))
+
+    def hash(self, power: int) -> float:
+        return round(self.nominal_hash * min(1.05, (power / self.nominal_power) ** 0.5), 2)
+
+    def temp(self, fan: int) -> int:
+        return int(round(40 + fan * 0.3 + self.rng.uniform(-1, 1)))
+
+    def info(self) -> dict:
+        return {'bus_id': f'{self.bus_number:02x}:00.0',
+                'bus_number': self.bus_number,
+                'index': self.index,
+                'brand': 'nvidia',
+                'model': f'GeForce {self.short_name}',
+                'short_name': self.short_name,
+                'details': {'mem': '8192 MB', 'vbios': '94.04.3A.00.1F', 'mem_type': 'GDDR6'},
+                'power_limit': {'min': f'{self.min_power} W',
+                                'def': f'{self.nominal_power} W',
+                                'max': f'{self.max_power} W'}}
+
+    def stats(self) -> dict:
+        power = self.power
+        fan = self.fan()
+        return {'bus_id': f'{self.bus_number:02x}:00.0',
+                'bus_number': self.bus_number,
+                'bus_num': self.bus_number,
+                'hash': self.hash(power),
+                'temp': self.temp(fan),
+                'fan': fan,
+                'power': power}
+
+
+class SimulatedWorker:
+    def __init__(self, worker_id: int, farm_id: int, n_gpus: int, seed: int):
+        # One generator per worker so its sensor noise doesn't depend on how requests to other workers interleave
+        rng = random.Random(seed * 1000003 + worker_id)
+        self.id = worker_id
+        self.farm_id = farm_id
+        self.name = f'rig{worker_id}'
+        self.lock = threading.Lock()
+        model = rng.choice(list(GPU_MODELS.keys()))
+        self.gpus = [SimulatedGpu(index=i, bus_number=i + 1, short_name=model, rng=rng) for i in range(n_gpus)]
+
+    def overclock(self) -> dict:
+        return {'nvidia': {'core_clock': ' '.join(str(gpu.core_clock) for gpu in self.gpus),
+                           'mem_clock': ' '.join(str(gpu.mem_clock) for gpu in self.gpus),
+                           'fan_speed': ' '.join('0' for _ in self.gpus),
+                           'power_limit': ' '.join(str(gpu.power_limit) for gpu in self.gpus)}}
+
+    def payload(self) -> dict:
+        with self.lock:
+            return {'id': self.id,
+                    'farm_id': self.farm_id,
+                    'name': self.name,
+                    'gpu_info': [gpu.info() for gpu in self.gpus],
+                    'gpu_stats': [gpu.stats() for gpu in self.gpus],
+                    'overclock': self.overclock()}
+
+    def gpus_payload(self) -> List[dict]:
+        with self.lock:
+            return [{**gpu.info(), **{'stats': gpu.stats(), 'worker': {'id': self.id, 'name': self.name}}}
+                    for gpu in self.gpus]
+
+    def metrics(self, n_points: int) -> List[dict]:
+        now = int(time.time())
+        points = []
+        with self.lock:
+            for t in range(n_points):
+                stats = [gpu.stats() for gpu in self.gpus]
+                points.append({'time': now - (n_points - t) * 300,
+                               'fan': [s['fan'] for s in stats],
+                               'temp': [s['temp'] for s in stats],
+                               'power_list': [s['power'] for s in stats],
+                               'power': sum(s['power'] for s in stats)})
+        return points
+
+    def apply_overclock(self, gpu_index: int, nvidia: dict):
+        with self.lock:
+            gpu = self.gpus[int(gpu_index)]
+            if 'power_limit' in nvidia:
+                gpu.set_power_limit(nvidia['power_limit'])
+            if 'core_clock' in nvidia:
+                gpu.core_clock = int(nvidia['core_clock'])
+            if 'mem_clock' in nvidia:
+                gpu.mem_clock = int(nvidia['mem_clock'])
+
+
+class HiveOSSimulator:
+    """
+    In-memory stand-in for the subset of the HiveOS v2 API used by HiveOSApi.
+    Farms, workers and each worker's sensor noise are generated from the seed so runs can be compared against each
+    other. Injected latency and faults come from a separate generator, so with concurrent clients which request gets
+    a 429 or a 500 depends on the arrival order.
+    Every request is counted per endpoint so cycle costs can be measured, and latency, 429 responses and server
+    failures can be injected with the given probabilities.
+
+    Besides the HiveOS routes, the HTTP server exposes GET /_stats, GET /_power_limits and POST /_reset, so an
+    external controller can be measured cycle by cycle: POST /_reset, run one cycle, then read /_stats and compare
+    /_power_limits with the previous cycle. run_cycles does the same in-process and times each cycle.
+    """
+    routes = [('GET', re.compile(r'^/farms$'), 'get_farms'),
+              ('GET', re.compile(r'^/farms/(\d+)$'), 'get_farm'),
+              ('GET', re.compile(r'^/farms/(\d+)/workers$'), 'get_workers'),
+              ('GET', re.compile(r'^/farms/(\d+)/workers/gpus$'), 'get_gpus'),
+              ('GET', re.compile(r'^/farms/(\d+)/workers/(\d+)/metrics$'), 'get_metrics'),
+              ('GET', re.compile(r'^/farms/(\d+)/oc$'), 'get_oc'),
+              ('POST', re.compile(r'^/farms/(\d+)/workers/overclock$'), 'post_overclock')]
+
+    def __init__(self, n_farms: int = 1, n_workers: int = 1, n_gpus: int = 8, first_farm_id: int = 600000,
+                 latency: Tuple[float, float] = (0., 0.), rate_limit_probability: float = 0.,
+                 failure_probability: float = 0., metrics_points: int = 12, seed: int = 0):
+        self.fault_rng = random.Random(seed)
+        self.fault_lock = threading.Lock()
+        self.latency = latency
+        self.rate_limit_probability = rate_limit_probability
+        self.failure_probability = failure_probability
+        self.metrics_points = metrics_points
+        self.farms = {}
+        worker_id = first_farm_id * 10
+        for farm_id in range(first_farm_id, first_farm_id + n_farms):
+            workers = {}
+            for _ in range(n_workers):
+                worker_id += 1
+                workers[worker_id] = SimulatedWorker(worker_id, farm_id, n_gpus, seed)
+            self.farms[farm_id] = workers
+        self.stats_lock = threading.Lock()
+        self.request_counts = Counter()
+        self.response_codes = Counter()
+
+    @property
+    def farm_ids(self) -> List[int]:
+        return list(self.farms.keys())
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.request_counts.clear()
+            self.response_codes.clear()
+
+    def stats(self) -> dict:
+        with self.stats_lock:
+            return {'requests': dict(self.request_counts),
+                    'total_requests': sum(self.request_counts.values()),
+                    'responses': {str(k): v for k, v in self.response_codes.items()}}
+
+    def handle(self, method: str, path: str, body: dict) -> Tuple[int, dict]:
+        """
+        Answer a request to the HiveOS API, as HTTP status code and json body.
+        >>> simulator = HiveOSSimulator(n_farms=1, n_workers=1, n_gpus=2)
+        >>> worker_id = simulator.farms[600000][6000001].id
+        >>> body = {'gpu_data': [{'gpus': [{'worker_id': worker_id, 'gpu_index': 1}],
+        ...                       'nvidia': {'core_clock': 0, 'mem_clock': 1000, 'power_limit': 10}}]}
+        >>> simulator.handle('POST', '/farms/600000/workers/overclock', body)
+        (200, {})
+        >>> code, response = simulator.handle('GET', '/farms/600000/workers', {})
+        >>> worker = response['data'][0]
+        >>> power_limits = worker['overclock']['nvidia']['power_limit'].split()
+        >>> code, power_limits[1] == worker['gpu_info'][1]['power_limit']['min'].split()[0]
+        (200, True)
+        >>> before = simulator.power_limits()
+        >>> simulator.handle('POST', '/farms/600000/workers/overclock',
+        ...                  {'gpu_data': [{'gpus': [{'worker_id': worker_id, 'gpu_index': 0}],
+        ...                                 'nvidia': {'power_limit': 250}},
+        ...                                {'gpus': [{'worker_id': 1, 'gpu_index': 0}],
+        ...                                 'nvidia': {'power_limit': 250}}]})
+        (422, {'message': 'Worker 1 not found'})
+        >>> simulator.handle('POST', '/farms/600000/workers/overclock',
+        ...                  {'gpu_data': [{'gpus': [{'worker_id': worker_id, 'gpu_index': 0}],
+        ...                                 'nvidia': {'power_limit': 250}},
+        ...                                {'gpus': [{'worker_id': worker_id, 'gpu_index': -1}],
+        ...                                 'nvidia': {'power_limit': 250}}]})
+        (422, {'message': 'Worker 6000001 has no gpu -1'})
+        >>> simulator.handle('POST', '/farms/600000/workers/overclock', {'gpu_data': [{'nvidia': {}}]})
+        (422, {'message': "gpu_data entries must have a 'gpus' list"})
+        >>> simulator.power_limits() == before
+        True
+        >>> simulator.stats()['responses']
+        {'200': 2, '422': 3}
+        """
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(path)
+            if route_method == method and match:
+                with self.stats_lock:
+                    self.request_counts[handler] += 1
+                with self.fault_lock:
+                    delay = self.fault_rng.uniform(*self.latency) if self.latency[1] > 0 else 0
+                    roll = self.fault_rng.random()
+                if delay:
+                    time.sleep(delay)
+                if roll < self.rate_limit_probability:
+                    code, response = 429, {'message': 'Too Many Attempts.'}
+                elif roll < self.rate_limit_probability + self.failure_probability:
+                    code, response = 500, {'message': 'Server Error'}
+                else:
+                    # A simulator bug must still produce a counted response instead of a dropped connection
+                    try:
+                        code, response = getattr(self, handler)(*[int(g) for g in match.groups()], body=body)
+                    except Exception as e:
+                        code, response = 500, {'message': f'Simulator error: {e!r}'}
+                break
+        else:
+            code, response = 404, {'message': 'Not found'}
+        with self.stats_lock:
+            self.response_codes[code] += 1
+        return code, response
+
+    def _farm(self, farm_id: int) -> dict:
+        workers = self.farms[farm_id]
+        return {'id': farm_id,
+                'name': f'farm{farm_id}',
+                'workers_count': len(workers),
+                'gpus_total': sum(len(w.gpus) for w in workers.values())}
+
+    def get_farms(self, body: dict = None):
+        return 200, {'data': [self._farm(farm_id) for farm_id in self.farms]}
+
+    def get_farm(self, farm_id: int, body: dict = None):
+        if farm_id not in self.farms:
+            return 404, {'message': 'Farm not found'}
+        return 200, self._farm(farm_id)
+
+    def get_workers(self, farm_id: int, body: dict = None):
+        if farm_id not in self.farms:
+            return 404, {'message': 'Farm not found'}
+        return 200, {'data': [worker.payload() for worker in self.farms[farm_id].values()]}
+
+    def get_gpus(self, farm_id: int, body: dict = None):
+        if farm_id not in self.farms:
+            return 404, {'message': 'Farm not found'}
+        return 200, {'data': [gpu for worker in self.farms[farm_id].values() for gpu in worker.gpus_payload()]}
+
+    def get_metrics(self, farm_id: int, worker_id: int, body: dict = None):
+        if worker_id not in self.farms.get(farm_id, {}):
+            return 404, {'message': 'Worker not found'}
+        return 200, {'data': self.farms[farm_id][worker_id].metrics(self.metrics_points)}
+
+    def get_oc(self, farm_id: int, body: dict = None):
+        if farm_id not in self.farms:
+            return 404, {'message': 'Farm not found'}
+        return 200, {'data': [{'id': worker.id, 'options': worker.overclock()}
+                              for worker in self.farms[farm_id].values()]}
+
+    def post_overclock(self, farm_id: int, body: dict = None):
+        if farm_id not in self.farms:
+            return 404, {'message': 'Farm not found'}
+        workers = self.farms[farm_id]
+        # Validate the whole request first so a rejected one doesn't leave earlier entries applied
+        error = self._overclock_error(workers, body)
+        if error:
+            return 422, {'message': error}
+        gpu_data_list = body.get('gpu_data', [])
+        for gpu_data in gpu_data_list:
+            for gpu in gpu_data['gpus']:
+                workers[int(gpu['worker_id'])].apply_overclock(gpu['gpu_index'], gpu_data.get('nvidia', {}))
+        return 200, {}
+
+    @staticmethod
+    def _overclock_error(workers: dict, body: dict) -> str:
+        """
+        Check the shape of an overclock request body and that every gpu it targets exists.
+        :return: Message describing the first problem found, or None if the request can be applied.
+        """
+        if not isinstance(body, dict) or not isinstance(body.get('gpu_data', []), list):
+            return "Body must be an object with a 'gpu_data' list"
+        for gpu_data in body.get('gpu_data', []):
+            if not isinstance(gpu_data, dict) or not isinstance(gpu_data.get('gpus'), list):
+                return "gpu_data entries must have a 'gpus' list"
+            nvidia = gpu_data.get('nvidia', {})
+            if not isinstance(nvidia, dict):
+                return "'nvidia' must be an object"
+            try:
+                [int(nvidia[key]) for key in ('power_limit', 'core_clock', 'mem_clock') if key in nvidia]
+            except (TypeError, ValueError):
+                return "'power_limit', 'core_clock' and 'mem_clock' must be integers"
+            for gpu in gpu_data['gpus']:
+                if not isinstance(gpu, dict) or 'worker_id' not in gpu or 'gpu_index' not in gpu:
+                    return "gpus entries must have 'worker_id' and 'gpu_index'"
+                try:
+                    worker_id, gpu_index = int(gpu['worker_id']), int(gpu['gpu_index'])
+                except (TypeError, ValueError):
+                    return "'worker_id' and 'gpu_index' must be integers"
+                if worker_id not in workers:
+                    return f"Worker {gpu['worker_id']} not found"
+                if not 0 <= gpu_index < len(workers[worker_id].gpus):
+                    return f"Worker {worker_id} has no gpu {gpu['gpu_index']}"
+        return None
+
+    def power_limits(self) -> dict:
+        result = {}
+        for workers in self.farms.values():
+            for worker in workers.values():
+                with worker.lock:
+                    result[worker.id] = [gpu.power_limit for gpu in worker.gpus]
+        return result
+
+    def run_cycles(self, controller: Callable[[], None], n_cycles: int) -> List[dict]:
+        """
+        Run <controller> <n_cycles> times against the simulator and report, per cycle, its duration, the requests it
+        made and how many gpus got a different power limit. A controller has converged once no gpus change.
+        """
+        report = []
+        for cycle in range(n_cycles):
+            power_limits = self.power_limits()
+            self.reset_stats()
+            error = None
+            start = time.perf_counter()
+            try:
+                controller()
+            except Exception as e:
+                error = repr(e)
+            elapsed = time.perf_counter() - start
+            changed_gpus = sum(before != after
+                               for worker_id, limits in self.power_limits().items()
+                               for before, after in zip(power_limits[worker_id], limits))
+            stats = self.stats()
+            report.append({'cycle': cycle,
+                           'seconds': round(elapsed, 3),
+                           'requests': stats['total_requests'],
+                           'overclock_requests': stats['requests'].get('post_overclock', 0),
+                           'changed_gpus': changed_gpus,
+                           'error': error})
+            print(json.dumps(report[-1]))
+        return report
+
+    def serve(self, host: str = '127.0.0.1', port: int = 8080) -> ThreadingHTTPServer:
+        simulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self, method: str):
+                path = self.path.split('?')[0]
+                if path.startswith('/api/v2'):
+                    path = path[len('/api/v2'):]
+                if method == 'GET' and path == '/_stats':
+                    code, response = 200, simulator.stats()
+                elif method == 'GET' and path == '/_power_limits':
+                    code, response = 200, {str(k): v for k, v in simulator.power_limits().items()}
+                elif method == 'POST' and path == '/_reset':
+                    simulator.reset_stats()
+                    code, response = 200, {}
+                else:
+                    length = int(self.headers.get('Content-Length', 0))
+                    try:
+                        body = json.loads(self.rfile.read(length)) if length else {}
+                    except ValueError:
+                        body = None  # Rejected by the route validation and still counted
+                    code, response = simulator.handle(method, path, body)
+                content = json.dumps(response).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                if code == 429:
+                    self.send_header('Retry-After', '1')
+                self.end_headers()
+                self.wfile.write(content)
+
+            def do_GET(self):
+                self._respond('GET')
+
+            def do_POST(self):
+                self._respond('POST')
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def write_config(base_config_path: str, output_path: str, base_url: str, farm_ids: List[int]):
+    """
+    Write a copy of the base configuration that points HiveOSApi to the simulator and autotunes all simulated farms.
+    """
+    configuration = load_yaml(base_config_path)
+    configuration['base_url'] = base_url
+    configuration['farms_to_autooc'] = farm_ids
+    with open(output_path, 'w') as stream:
+        yaml.safe_dump(configuration, stream, sort_keys=False)
+
+
+def main(host: str = '127.0.0.1', port: int = 8080, n_farms: int = 1, n_workers: int = 1, n_gpus: int = 8,
+         first_farm_id: int = 600000, latency: Tuple[float, float] = (0., 0.), rate_limit_probability: float = 0.,
+         failure_probability: float = 0., seed: int = 0, base_config_path: str = 'data/config.yaml',
+         config_out: str = None, cycles: int = 0, controller: str = 'fan_tune'):
+    """
+    Serve a simulated farm until interrupted, then print the request stats.
+    If <cycles> is given, instead run the main(config_path) of the <controller> module that many times against the
+    simulator, reporting each cycle, and exit.
+    """
+    simulator = HiveOSSimulator(n_farms=n_farms, n_workers=n_workers, n_gpus=n_gpus, first_farm_id=first_farm_id,
+                                latency=latency, rate_limit_probability=rate_limit_probability,
+                                failure_probability=failure_probability, seed=seed)
+    base_url = f'http://{host}:{port}/api/v2'
+    if config_out:
+        write_config(base_config_path, config_out, base_url, simulator.farm_ids)
+    server = simulator.serve(host, port)
+    print(f'Serving {n_farms} farms x {n_workers} workers x {n_gpus} gpus on {base_url}')
+    if cycles:
+        controller_module = importlib.import_module(controller)
+        simulator.run_cycles(lambda: controller_module.main(config_path=config_out), cycles)
+        server.shutdown()
+        return
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(json.dumps(simulator.stats(), indent=4))
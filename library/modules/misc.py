@@ -1,5 +1,6 @@
+from itertools import product
 from subprocess import Popen, PIPE
-from typing import Tuple, Union, List
+from typing import Iterator, Tuple, Union, List
 
 
 def join_dicts(*dicts: dict) -> dict:
@@ -23,3 +24,15 @@ def execute_bash(args: Union[str, List[str]], continue_on_error: bool = False) -
     if args[0] == 'ls':
         output = str(output).split('\\n')
     return output, err, rc
+
+
+def parameter_grid(parameters: dict) -> Iterator[dict]:
+    """
+    Yield every combination of the values in <parameters> as a dict, iterating keys in sorted order with the last key
+    varying fastest (same order as sklearn's ParameterGrid, without importing sklearn).
+    >>> list(parameter_grid({'b': [1, 2], 'a': ['x']}))
+    [{'a': 'x', 'b': 1}, {'a': 'x', 'b': 2}]
+    """
+    keys = sorted(parameters.keys())
+    for values in product(*[parameters[k] for k in keys]):
+        yield dict(zip(keys, values))
@@ -0,0 +1,89 @@
+import csv
+import datetime
+import re
+import subprocess
+import sys
+from os import path
+from typing import List, Tuple
+
+# Measurements import the tools by module name, so they run from the repository root whatever the caller's cwd is
+REPO_ROOT = path.dirname(path.dirname(path.dirname(path.abspath(__file__))))
+
+IMPORTTIME_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)\s*$')
+
+
+def parse_import_time(report: str, modules: List[str]) -> Tuple[float, List[Tuple[str, float]]]:
+    """
+    Parse the stderr of `python -X importtime`.
+    :param report: Text written by the interpreter to stderr.
+    :param modules: Modules that were imported on purpose. Only these and their parent packages are listed as top
+                    modules, so interpreter startup imports such as site or encodings are left out.
+    :return: Sum of the self import times in ms and the list of (requested module, cumulative ms) sorted by descending
+             cost.
+    >>> report = '\\n'.join(['import time: self [us] | cumulative | imported package',
+    ...                      'import time:       900 |        900 | site',
+    ...                      'import time:       300 |        300 |   yaml.error',
+    ...                      'import time:      1200 |       1500 | yaml',
+    ...                      'import time:       500 |        500 | json',
+    ...                      'import time:       100 |        100 | matplotlib',
+    ...                      'import time:       400 |        400 | matplotlib.pyplot'])
+    >>> parse_import_time(report, ['yaml', 'matplotlib.pyplot'])
+    (3.4, [('yaml', 1.5), ('matplotlib.pyplot', 0.4), ('matplotlib', 0.1)])
+    """
+    wanted = {'.'.join(module.split('.')[:i + 1]) for module in modules for i in range(module.count('.') + 1)}
+    total_us = 0
+    top_level = []
+    for line in report.splitlines():
+        match = IMPORTTIME_PATTERN.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        total_us += int(self_us)
+        if len(indent) == 1 and module in wanted:  # Requested modules, imported directly by the measured statement
+            top_level.append((module, int(cumulative_us) / 1000))
+    return total_us / 1000, sorted(top_level, key=lambda x: x[1], reverse=True)
+
+
+def _run_import_time(statement: str) -> str:
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True,
+                            cwd=REPO_ROOT)
+    return result.stderr
+
+
+def measure_import_time(modules: List[str]) -> Tuple[float, List[Tuple[str, float]]]:
+    """
+    Import <modules> on a fresh interpreter under `python -X importtime` and parse its report.
+    The import time of a bare interpreter (`-c pass`) is subtracted from the total, so the result only counts what the
+    requested modules add to startup.
+    :param modules: Modules to import, in order.
+    :return: Total import time in ms and the list of (requested module, cumulative ms) sorted by descending cost.
+    :raises subprocess.CalledProcessError: If any of the modules can't be imported.
+    """
+    statement = '; '.join(f'import {module}' for module in modules)
+    total_ms, top_level = parse_import_time(_run_import_time(statement), modules)
+    baseline_ms, _ = parse_import_time(_run_import_time('pass'), [])
+    return max(total_ms - baseline_ms, 0.), top_level
+
+
+def track_import_time(name: str, modules: List[str], history_path: str, n_top: int = 5) -> float:
+    """
+    Measure the import time of <modules>, print it and append it to the csv history at <history_path>.
+    :return: Total import time in ms.
+    """
+    total_ms, top_level = measure_import_time(modules)
+    print(f'{name}: {total_ms:.1f} ms')
+    for module, cumulative_ms in top_level[:n_top]:
+        print(f'    {module}: {cumulative_ms:.1f} ms')
+
+    new_file = not path.exists(history_path)
+    with open(history_path, 'a', newline='') as stream:
+        writer = csv.writer(stream)
+        if new_file:
+            writer.writerow(['date', 'python', 'subcommand', 'import_ms', 'top_modules'])
+        writer.writerow([datetime.datetime.now().isoformat(timespec='seconds'),
+                         '.'.join(str(v) for v in sys.version_info[:3]),
+                         name,
+                         round(total_ms, 1),
+                         ' '.join(f'{module}={cumulative_ms:.1f}' for module, cumulative_ms in top_level[:n_top])])
+    return total_ms
@@ -1,18 +1,17 @@
-import pandas as pd
-import numpy as np
-import datetime as dt
-import pytz
-
-from dateutil.relativedelta import relativedelta
+from typing import TYPE_CHECKING
 
 # from sklearn.model_selection import ParameterGrid
-import sqlite3
 
 from library.modules.api import HiveOSApi
 from library.modules.code_patterns import AttDict
 from library.modules.config import ConfigBase
 from library.modules.misc import join_dicts
 
+if TYPE_CHECKING:
+    import pandas as pd
+
+DEPENDENCIES = ('sqlite3', 'pandas')
+
 
 def autenticate(config: AttDict) -> dict:
     return {'conection': True}
@@ -22,35 +21,43 @@ def get_gpus(api: any, config: AttDict) -> dict:
     return {}
 
 
-def get_metrics(api: any, gpu: str, config: AttDict) -> pd.DataFrame:
+def get_metrics(api: any, gpu: str, config: AttDict) -> 'pd.DataFrame':
+    import pandas as pd
+
     return pd.DataFrame()
 
 
-now = dt.datetime.now(tz=pytz.timezone('Europe/Madrid'))
-config = ConfigBase('data/config.yaml')
-api = HiveOSApi(config)
-# farms = api.farms()
-# farm = api.farm('543234')
-for farm_id in config.farms_to_autooc:
-    all_gpus = api.gpus(farm_id)
-    for worker in api.workers(farm_id):
-        gpus = [gpu for gpu in all_gpus
-                if gpu['worker']['id'] == worker['id']]
-        all_metrics = api.metrics(farm_id, worker['id'])
-        for gpu in gpus:
-            i = gpu['index']
-            metrics = [join_dicts({'time': d['time'],
-                                   'fan': d['fan'][i],
-                                   'temp': d['temp'][i],
-                                   'power': d['power_list'][i],
-                                   'total_power': d['power']},
-                                  {})
-                       for d in all_metrics]
-        print('developping...')
-db = sqlite3.connect('data/gpu_metrics.db')
-
-for gpu, gpu_attributes in gpus.items():
-    print(f'Checking gpu {gpu}')
-    metrics = get_metrics(api, gpu, config)
-
-print('The end')
+def main(config_path: str = 'data/config.yaml'):
+    config = ConfigBase(config_path)
+    api = HiveOSApi(config)
+    # farms = api.farms()
+    # farm = api.farm('543234')
+    for farm_id in config.farms_to_autooc:
+        all_gpus = api.gpus(farm_id)
+        for worker in api.workers(farm_id):
+            gpus = [gpu for gpu in all_gpus
+                    if gpu['worker']['id'] == worker['id']]
+            all_metrics = api.metrics(farm_id, worker['id'])
+            for gpu in gpus:
+                i = gpu['index']
+                metrics = [join_dicts({'time': d['time'],
+                                       'fan': d['fan'][i],
+                                       'temp': d['temp'][i],
+                                       'power': d['power_list'][i],
+                                       'total_power': d['power']},
+                                      {})
+                           for d in all_metrics]
+            print('developping...')
+    import sqlite3
+
+    db = sqlite3.connect('data/gpu_metrics.db')
+
+    for gpu, gpu_attributes in gpus.items():
+        print(f'Checking gpu {gpu}')
+        metrics = get_metrics(api, gpu, config)
+
+    print('The end')
+
+
+if __name__ == '__main__':
+    main()